@@ -0,0 +1,51 @@
+'''
+Allocation Benchmark for Single Value Parsing
+---------------------------------------------
+
+Compares the bytes allocated per call by the route 'equatic.parse' took
+for single values before compilation (a new EquationParser per call)
+against the compiled scalar path it now uses. Runs on Python 3.6+.
+
+Usage (with EquatIC installed):
+
+    python benchmarks/alloc_parse.py [equation] [x value] [n_calls]
+'''
+import sys
+import tracemalloc
+
+import equatic
+from equatic import EquationParser
+
+
+def full_parser(equation_string, func_range=None):
+    # The single value route 'equatic.parse' took before compilation was
+    # added, including its second 'calculate' call on the given value
+    temp_parser = EquationParser('temp', log='ERROR')
+    equation_string = equatic._convert_nums(equation_string)
+    temp_parser.parse_equation_string(equation_string)
+    return temp_parser.calculate(func_range)
+
+def compiled_parse(equation_string, func_range=None):
+    return equatic.parse(equation_string, func_range)
+
+def bytes_per_call(func, n_calls, *args):
+    func(*args)
+    total = 0
+    for _ in range(n_calls):
+        # Restarting tracing resets the peak, as reset_peak needs Python 3.9
+        tracemalloc.start()
+        func(*args)
+        total += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return total/n_calls
+
+if __name__ == '__main__':
+    equation = sys.argv[1] if len(sys.argv) > 1 else 'tan(1)'
+    value = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    n_calls = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    before = bytes_per_call(full_parser, n_calls, equation, value)
+    after = bytes_per_call(compiled_parse, n_calls, equation, value)
+    print("Peak bytes allocated per call for '{}', x = {} ({} calls)".format(
+        equation, value, n_calls))
+    print("  EquationParser : {:>12.1f}".format(before))
+    print("  equatic.parse  : {:>12.1f}".format(after))
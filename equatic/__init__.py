@@ -12,9 +12,17 @@ author = 'Kristian Zarebski'
 
 import logging
 import mpmath as mt
-from sympy import simplify
-from numpy import atleast_1d, array, linspace, where
+from sympy import simplify, sympify, lambdify, Function, Symbol, SympifyError
+from sympy.core.function import AppliedUndef
+from sympy.printing.pycode import PythonCodePrinter
+import numpy as np
+from numpy import (atleast_1d, array, linspace, where, arange, append, full,
+                   fromiter, column_stack, concatenate, isfinite, maximum,
+                   minimum, repeat, savetxt, errstate, inf, nan)
+from numpy.lib.format import write_array_header_1_0, dtype_to_descr
 from copy import deepcopy
+from functools import lru_cache
+import os
 import re
 import sys
 
@@ -25,12 +33,12 @@ class EquationParser(object):
     __author__ = author
 
     def __init__(self, name, xarray=None, log='INFO'):
-        trig_dict = {'asin': mt.asin, 'acos': mt.acos, 'atan': mt.tan,
+        trig_dict = {'asin': mt.asin, 'acos': mt.acos, 'atan': mt.atan,
                      'cospi': mt.cospi, 'sinpi': mt.sinpi, 'sinc': mt.sinc,
                      'cosec': mt.csc, 'sec': mt.sec, 'cot': mt.cot,
                      'sin': mt.sin, 'cos': mt.cos, 'tan': mt.tan}
-        hyp_dict = {'asinh': mt.asinh, 'acosh': mt.acosh, 'atanh': mt.tanh,
-                    'sinh': mt.sinh, 'cosh': mt.cosh, 'tanh': mt.tan,
+        hyp_dict = {'asinh': mt.asinh, 'acosh': mt.acosh, 'atanh': mt.atanh,
+                    'sinh': mt.sinh, 'cosh': mt.cosh, 'tanh': mt.tanh,
                     'cosech': mt.csch, 'sech': mt.sech, 'coth': mt.coth}
 
         log_ind_dict = {'log10': mt.log10, 'exp': mt.exp, 'log': mt.log}
@@ -38,7 +46,7 @@ class EquationParser(object):
         others_dict = {'sqrt': mt.sqrt, 'cbrt': mt.cbrt, 'root': mt.root,
                        'power': mt.power, 'expm1': mt.expm1,
                        'fac': mt.factorial, 'fac2': mt.fac2,
-                       'rgamma': mt.gamma, 'loggamma': mt.loggamma,
+                       'rgamma': mt.rgamma, 'loggamma': mt.loggamma,
                        'gamma': mt.gamma, 'superfac': mt.superfac, 
                        'hyperfac': mt.hyperfac, 'barnesg': mt.barnesg,
                        'psi': mt.psi, 'harmonic': mt.harmonic,
@@ -92,11 +100,12 @@ class EquationParser(object):
             if char in string:
                 remainders += char
         string = re.sub(r'\W+', '', string)
-        string = re.sub(r'\d+', '', string)
-        keys = [key for key in self.parser_dict]
-        keys += 'x'
+        # Remove longest names first so 'exp' does not clip 'expm1'
+        keys = sorted(self.parser_dict, key=len, reverse=True)
         for key in keys:
             string = string.replace(key, '')
+        string = re.sub(r'\d+', '', string)
+        string = string.replace('x', '')
         if len(list(remainders)) != 0:
             self.logger.critical("String contains Dangerous characters and "+
                 "will not be processed. Operation has terminated.")
@@ -406,6 +415,13 @@ class EquationParser(object):
     def add_function(self, name, func):
         '''Add a new function to the parser's library'''
         self.parser_dict[name] = func
+
+    def compile_equation_string(self, eqn_string):
+        '''Compile an equation into a CompiledEquation for scalar evaluation'''
+        eqn_string = '({})'.format(eqn_string)
+        self.clean_input(eqn_string)
+        self.logger.debug("Compiling %s for scalar evaluation.", eqn_string)
+        return CompiledEquation(eqn_string, self.parser_dict)
     
     def plot(self):
         try:
@@ -415,18 +431,156 @@ class EquationParser(object):
         return plot(self.eqn_string, 
                     [min(self.xarray), max(self.xarray), len(self.xarray)])
 
+# Numpy equivalents of the default parser functions for evaluating arrays
+_numpy_funcs = {'sin': (mt.sin, np.sin), 'cos': (mt.cos, np.cos),
+                'tan': (mt.tan, np.tan), 'asin': (mt.asin, np.arcsin),
+                'acos': (mt.acos, np.arccos), 'atan': (mt.atan, np.arctan),
+                'sinc': (mt.sinc, lambda v: np.sin(v)/v),
+                'cosec': (mt.csc, lambda v: 1/np.sin(v)),
+                'sec': (mt.sec, lambda v: 1/np.cos(v)),
+                'cot': (mt.cot, lambda v: 1/np.tan(v)),
+                'sinh': (mt.sinh, np.sinh), 'cosh': (mt.cosh, np.cosh),
+                'tanh': (mt.tanh, np.tanh), 'asinh': (mt.asinh, np.arcsinh),
+                'acosh': (mt.acosh, np.arccosh), 'atanh': (mt.atanh, np.arctanh),
+                'cosech': (mt.csch, lambda v: 1/np.sinh(v)),
+                'sech': (mt.sech, lambda v: 1/np.cosh(v)),
+                'coth': (mt.coth, lambda v: 1/np.tanh(v)),
+                'log10': (mt.log10, np.log10), 'exp': (mt.exp, np.exp),
+                'log': (mt.log, np.log), 'sqrt': (mt.sqrt, np.sqrt),
+                'cbrt': (mt.cbrt, np.cbrt), 'expm1': (mt.expm1, np.expm1),
+                'root': (mt.root, lambda v, n: np.power(v, 1./n)),
+                'power': (mt.power, np.power),
+                'npdf': (mt.npdf, lambda v, mu=0, sigma=1:
+                         np.exp(-(v - mu)**2/(2*sigma**2))/(sigma*np.sqrt(2*np.pi)))}
+
+class _IEEEPrinter(PythonCodePrinter):
+    '''Printer writing numbers as numpy floats so division follows IEEE rules'''
+
+    def _print_Float(self, expr):
+        return 'float64({!r})'.format(float(expr))
+
+    _print_Integer = _print_Rational = _print_Float
+
+def _ieee_func(func):
+    '''Wrap a parser function to return numpy floats and inf at poles'''
+    def ieee_func(*args):
+        try:
+            return np.float64(func(*args))
+        except (ZeroDivisionError, ValueError):
+            return np.float64(inf)
+    return ieee_func
+
+class CompiledEquation(object):
+    '''Compiled Equation for fast repeated evaluation at single values'''
+
+    __slots__ = ('eqn_string', 'logger', '_func', '_ieee', '_vector', '_const')
+
+    def __init__(self, eqn_string, parser_dict):
+        functions = {name: Function(name) for name in parser_dict}
+        self.eqn_string = eqn_string
+        self.logger = logging.getLogger(__name__)
+        self._vector = self._const = None
+        try:
+            # Unevaluated so that divisions by zero are kept as written
+            expr = sympify(eqn_string, locals=functions, evaluate=False)
+        except SympifyError:
+            self.logger.error("Could not compile equation '%s'", eqn_string)
+            raise SystemExit
+        self._func = lambdify(Symbol('x'), expr, modules=[parser_dict])
+        ieee_dict = {name: _ieee_func(func) for name, func in parser_dict.items()}
+        ieee_dict['float64'] = np.float64
+        printer = _IEEEPrinter({'fully_qualified_modules': False,
+                                'inline': True,
+                                'allow_unknown_functions': True,
+                                'user_functions': {name: name for name in ieee_dict}})
+        self._ieee = lambdify(Symbol('x'), expr, modules=[ieee_dict], printer=printer)
+        names = {func.func.__name__ for func in expr.atoms(AppliedUndef)}
+        if all(name in _numpy_funcs and parser_dict[name] is _numpy_funcs[name][0]
+               for name in names):
+            numpy_dict = {name: _numpy_funcs[name][1] for name in names}
+            self._vector = lambdify(Symbol('x'), expr, modules=[numpy_dict])
+        if not expr.free_symbols:
+            # Equation does not depend on x so only needs evaluating once
+            self._const = self(0.0)
+
+    def __call__(self, x=0.0):
+        if self._const is not None:
+            return self._const
+        try:
+            try:
+                return float(self._func(float(x)))
+            except (ZeroDivisionError, ValueError):
+                # Division by zero or an mpmath pole such as gamma(0)
+                return self._evaluate_ieee(float(x))
+        except Exception:
+            self.logger.error("Could not evaluate %s as a real number for "
+                              "x = %s, this version of EquatIC does not "
+                              "support computation of complex numbers.",
+                              self.eqn_string,
+                              x)
+            raise ArithmeticError
+
+    def _evaluate_ieee(self, x):
+        '''Evaluate with IEEE arithmetic, giving inf for poles and nan for 0/0'''
+        with errstate(all='ignore'):
+            value = float(self._ieee(np.float64(x)))
+        if abs(value) == inf:
+            self.logger.warning('Function evaluates to Infinity...')
+            return float('inf')
+        return value
+
+    def evaluate_array(self, x):
+        '''Evaluate the equation for an array of x values'''
+        if self._const is not None:
+            return full(len(x), self._const)
+        if self._vector is None:
+            return fromiter(map(self, x), dtype=float, count=len(x))
+        with errstate(all='ignore'):
+            y = array(self._vector(x), dtype=float)
+        # Non-finite points are rechecked with mpmath so poles give inf,
+        # 0/0 forms stay nan and complex results raise as for single values
+        invalid = ~isfinite(y)
+        if invalid.any():
+            y[invalid] = fromiter(map(self, x[invalid]),
+                                  dtype=float,
+                                  count=invalid.sum())
+        return y
+
+def _convert_nums(equation_string):
+    '''Convert the numbers within an equation string to floats'''
+    # Digits within function names such as 'log10' are left untouched
+    return re.sub(r'(?<![\w.])(\d+\.?\d*|\.\d+)',
+                  lambda num: str(float(num.group())),
+                  equation_string)
+
+@lru_cache(maxsize=256)
+def _compile_equation(equation_string, debug):
+    temp_parser = EquationParser('temp', xarray=0, log=debug)
+    return temp_parser.compile_equation_string(_convert_nums(equation_string))
+
+def compile_equation(equation_string, debug='ERROR'):
+    '''Compile an equation string, reusing previous results for repeat calls'''
+    compiled = _compile_equation(equation_string, debug)
+    # Cached equations skip parser creation so the log level is set here
+    if logging.getLevelName(compiled.logger.level) != debug:
+        compiled.logger.setLevel(debug)
+    return compiled
+
 def parse(equation_string, func_range=None, debug='ERROR'):
+    if func_range is None or isinstance(func_range, (int, float)):
+        x = float(func_range) if func_range else 0.0
+        compiled = compile_equation(equation_string, debug=debug)
+        value = compiled(x)
+        compiled.logger.debug("F(%s) = %s for equation %s",
+                              x,
+                              value,
+                              compiled.eqn_string)
+        return value
     temp_parser = EquationParser('temp', log=debug)
-    get_nums = re.findall(r'([\d|\.|-]+)', equation_string)
-    get_nums = list(dict.fromkeys(get_nums))
-    get_nums = sorted(get_nums, key=len)
-    for num in get_nums:
-        equation_string = equation_string.replace(num, str(float(num)))
+    equation_string = _convert_nums(equation_string)
     temp_parser.parse_equation_string(equation_string)
     if not isinstance(func_range, list):
-        if not func_range:
-            x = 0
-        x = func_range 
+        x = func_range
     elif len(func_range) == 2:
         x = linspace(func_range[0], func_range[1], 1000)
     else:
@@ -434,6 +588,92 @@ def parse(equation_string, func_range=None, debug='ERROR'):
 
     return temp_parser.calculate(x)
 
+def _check_chunk_args(num, chunk_size, filename=None):
+    '''Check the number of points, chunk size and export file name before evaluating'''
+    logger = logging.getLogger(__name__)
+    if num < 1:
+        logger.error("Number of points must be at least 1, got %s", num)
+        raise ValueError
+    if chunk_size < 1:
+        logger.error("Chunk size must be at least 1, got %s", chunk_size)
+        raise ValueError
+    if filename and not filename.endswith(('.npy', '.csv')):
+        logger.error("Export file '%s' must end in '.npy' or '.csv'", filename)
+        raise ValueError
+
+def evaluate_chunks(equation_string, func_range, chunk_size=100000, debug='ERROR'):
+    '''Evaluate an equation over a range, yielding (x, y) arrays per chunk'''
+    num = int(func_range[2]) if len(func_range) > 2 else 1000
+    _check_chunk_args(num, chunk_size)
+    step = (func_range[1] - func_range[0])/(num - 1) if num > 1 else 0.
+    eqn = compile_equation(equation_string, debug=debug)
+    for i in range(0, num, chunk_size):
+        x = func_range[0] + arange(i, min(i + chunk_size, num))*step
+        if i + len(x) == num and num > 1:
+            x[-1] = func_range[1]
+        yield x, eqn.evaluate_array(x)
+
+def _export_chunks(chunks, filename, num):
+    '''Write chunks to a '.npy' or CSV file as they pass through'''
+    # Written under a temporary name so a failed export leaves no file
+    part_name = '{}.part'.format(filename)
+    try:
+        if filename.endswith('.npy'):
+            with open(part_name, 'wb') as out:
+                write_array_header_1_0(out, {'descr': dtype_to_descr(np.dtype(float)),
+                                             'fortran_order': False,
+                                             'shape': (num, 2)})
+                for x, y in chunks:
+                    column_stack((x, y)).tofile(out)
+                    yield x, y
+        else:
+            with open(part_name, 'w') as out:
+                for x, y in chunks:
+                    savetxt(out, column_stack((x, y)), delimiter=',')
+                    yield x, y
+    except BaseException:
+        logging.getLogger(__name__).error("Export to '%s' did not complete, "
+                                          "no file has been written.", filename)
+        os.remove(part_name)
+        raise
+    os.replace(part_name, filename)
+
+def _minmax_bins(x, y, points_per_bin):
+    '''Reduce a chunk to the minimum and maximum finite value of each bin'''
+    if points_per_bin == 1:
+        return x, y
+    n_bins = -(-len(y)//points_per_bin)
+    pad = n_bins*points_per_bin - len(y)
+    finite = isfinite(y)
+    lows = append(where(finite, y, inf), full(pad, inf))
+    highs = append(where(finite, y, -inf), full(pad, -inf))
+    lows = lows.reshape(n_bins, points_per_bin)
+    highs = highs.reshape(n_bins, points_per_bin)
+    i_min = lows.argmin(axis=1)
+    i_max = highs.argmax(axis=1)
+    offset = arange(n_bins)*points_per_bin
+    index = column_stack((minimum(i_min, i_max) + offset,
+                          maximum(i_min, i_max) + offset)).ravel()
+    x_out, y_out = x[index], y[index]
+    # Bins containing no finite values leave a gap in the plotted line
+    y_out[repeat(~isfinite(lows.min(axis=1)), 2)] = nan
+    return x_out, y_out
+
+def export(equation_string,
+           filename,
+           func_range=[0.1, 10],
+           chunk_size=100000,
+           debug='ERROR'):
+    '''Evaluate an equation and stream the x, y values to a '.npy' or CSV file'''
+    num = int(func_range[2]) if len(func_range) > 2 else 1000
+    _check_chunk_args(num, chunk_size, filename)
+    chunks = evaluate_chunks(equation_string,
+                             [func_range[0], func_range[1], num],
+                             chunk_size,
+                             debug)
+    for _ in _export_chunks(chunks, filename, num):
+        pass
+
 def plot(equation_string, 
          func_range=[0.1, 10], 
          xlabel='x', 
@@ -442,28 +682,43 @@ def plot(equation_string,
          plot_opts = '-', 
          save=None, 
          show=True, 
-         title=None):
+         title=None,
+         export=None,
+         resolution=None,
+         chunk_size=100000):
+    num = int(func_range[2]) if len(func_range) > 2 else 1000
+    _check_chunk_args(num, chunk_size, export)
     import matplotlib.pyplot as plt
-    num = 1000
-    if len(func_range) > 2:
-        num = func_range[2]
-    else:
-        func_range.append(num)
-    x = linspace(func_range[0], func_range[1], func_range[2])
-    y = parse(equation_string, func_range, debug=debug)
+    if not resolution:
+        fig = plt.gcf()
+        resolution = int(fig.get_figwidth()*fig.dpi)
+    points_per_bin = max(1, -(-num//resolution))
+    chunk_size = max(points_per_bin, chunk_size//points_per_bin*points_per_bin)
+    chunks = evaluate_chunks(equation_string,
+                             [func_range[0], func_range[1], num],
+                             chunk_size,
+                             debug)
+    if export:
+        chunks = _export_chunks(chunks, export, num)
+    x_plot, y_plot = [], []
+    asymptote, y_max = None, None
+    for x, y in chunks:
+        finite = isfinite(y)
+        if finite.any():
+            chunk_max = y[finite].max()
+            y_max = chunk_max if y_max is None else max(y_max, chunk_max)
+        if asymptote is None and (y == inf).any():
+            asymptote = x[(y == inf).argmax()]
+        x, y = _minmax_bins(x, y, points_per_bin)
+        x_plot.append(x)
+        y_plot.append(y)
     if title:
         plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
-    plt.plot(x, y, plot_opts)
-    import math
-    if float('inf') in y:
-        y_vals_list = y.tolist()
-        index = y_vals_list.index(float('inf'))
-        y_vals_list.remove(float('inf'))
-        x_tmp = array([x[index] for i in range(100)])
-        y_tmp = linspace(0, max(y_vals_list), 100)
-        plt.plot(x_tmp, y_tmp, '--')
+    plt.plot(concatenate(x_plot), concatenate(y_plot), plot_opts)
+    if asymptote is not None:
+        plt.plot([asymptote, asymptote], [0, y_max or 0], '--')
     if save:
         plt.savefig(save)
     if show:
@@ -1,8 +1,11 @@
 import unittest
-from equatic import EquationParser
+import equatic
+from equatic import EquationParser, CompiledEquation
 import mpmath as mpm
 import numpy as np
 import sys
+import os
+import tempfile
 
 import logging
 
@@ -152,7 +155,209 @@ class TestEQTC(unittest.TestCase):
        test_parser = EquationParser('testChainedFunc', xarray=5, log='DEBUG')
        value = test_parser.parse_equation_string('tan(x)+sin(x)')
        self.assertAlmostEqual(value, float(mpm.tan(5)+mpm.sin(5)),places=5)
-        
+
+    def test_compiled_equation(self):
+        _logger.info("\nRunning Compiled Equation Test: 'npdf(x)+tan(x)'")
+        test_parser = EquationParser('testCompiled', xarray=0, log='ERROR')
+        compiled = test_parser.compile_equation_string('npdf(x)+tan(x)')
+        self.assertIsInstance(compiled, CompiledEquation)
+        self.assertFalse(hasattr(compiled, '__dict__'))
+        for x in [-1.5, 0.0, 0.5, 3.0]:
+            self.assertAlmostEqual(compiled(x), float(mpm.npdf(x)+mpm.tan(x)), places=10)
+
+    def test_parse_all_functions(self):
+        _logger.info("\nRunning Single Value Test for all Parser Functions")
+        expected = {'asin': ('asin(x)', 0.5, mpm.asin(0.5)),
+                    'acos': ('acos(x)', 0.5, mpm.acos(0.5)),
+                    'atan': ('atan(x)', 0.5, mpm.atan(0.5)),
+                    'cospi': ('cospi(x)', 0.25, mpm.cospi(0.25)),
+                    'sinpi': ('sinpi(x)', 0.25, mpm.sinpi(0.25)),
+                    'sinc': ('sinc(x)', 0.5, mpm.sin(0.5)/0.5),
+                    'cosec': ('cosec(x)', 0.5, 1/mpm.sin(0.5)),
+                    'sec': ('sec(x)', 0.5, 1/mpm.cos(0.5)),
+                    'cot': ('cot(x)', 0.5, 1/mpm.tan(0.5)),
+                    'sin': ('sin(x)', 0.5, mpm.sin(0.5)),
+                    'cos': ('cos(x)', 0.5, mpm.cos(0.5)),
+                    'tan': ('tan(x)', 0.5, mpm.tan(0.5)),
+                    'asinh': ('asinh(x)', 0.5, mpm.asinh(0.5)),
+                    'acosh': ('acosh(x)', 1.5, mpm.acosh(1.5)),
+                    'atanh': ('atanh(x)', 0.5, mpm.atanh(0.5)),
+                    'sinh': ('sinh(x)', 0.5, mpm.sinh(0.5)),
+                    'cosh': ('cosh(x)', 0.5, mpm.cosh(0.5)),
+                    'tanh': ('tanh(x)', 0.5, mpm.tanh(0.5)),
+                    'cosech': ('cosech(x)', 0.5, 1/mpm.sinh(0.5)),
+                    'sech': ('sech(x)', 0.5, 1/mpm.cosh(0.5)),
+                    'coth': ('coth(x)', 0.5, 1/mpm.tanh(0.5)),
+                    'log10': ('log10(x)', 100, 2.),
+                    'exp': ('exp(x)', 0.5, mpm.exp(0.5)),
+                    'log': ('log(x)', 0.5, mpm.log(0.5)),
+                    'sqrt': ('sqrt(x)', 2, mpm.sqrt(2)),
+                    'cbrt': ('cbrt(x)', 2, mpm.cbrt(2)),
+                    'root': ('root(x, 3)', 8, 2.),
+                    'power': ('power(x, 3)', 2, 8.),
+                    'expm1': ('expm1(x)', 0.5, mpm.exp(0.5)-1),
+                    'fac': ('fac(x)', 5, 120.),
+                    'fac2': ('fac2(x)', 5, 15.),
+                    'rgamma': ('rgamma(x)', 0.5, 1/mpm.gamma(0.5)),
+                    'loggamma': ('loggamma(x)', 0.5, mpm.log(mpm.gamma(0.5))),
+                    'gamma': ('gamma(x)', 0.5, mpm.sqrt(mpm.pi)),
+                    'superfac': ('superfac(x)', 3, 12.),
+                    'hyperfac': ('hyperfac(x)', 3, 108.),
+                    'barnesg': ('barnesg(x)', 4, 2.),
+                    'psi': ('psi(0, x)', 2, 1-mpm.euler),
+                    'harmonic': ('harmonic(x)', 3, 11/6.),
+                    'npdf': ('npdf(x)', 0.5, mpm.exp(-0.125)/mpm.sqrt(2*mpm.pi))}
+        test_parser = EquationParser('testAllFuncs', log='ERROR')
+        self.assertSetEqual(set(expected), set(test_parser.parser_dict))
+        for name, (eqn_string, x, value) in expected.items():
+            self.assertAlmostEqual(equatic.parse(eqn_string, x), float(value),
+                                   places=10, msg=name)
+
+    def test_parse_single_value(self):
+        _logger.info("\nRunning Single Value Parse Test: 'tan(1)'")
+        self.assertAlmostEqual(equatic.parse('tan(1)'), float(mpm.tan(1)), places=10)
+        self.assertAlmostEqual(equatic.parse('npdf(x)', 0.5), float(mpm.npdf(0.5)), places=10)
+        self.assertEqual(equatic.parse('1/(x+1)', -1), np.inf)
+        self.assertEqual(equatic.parse('gamma(0)'), np.inf)
+        self.assertEqual(equatic.parse('gamma(x)', -1), np.inf)
+        self.assertEqual(equatic.parse('1/0'), np.inf)
+        self.assertEqual(equatic.parse('x/0', 1), np.inf)
+        self.assertTrue(np.isnan(equatic.parse('0/0')))
+        self.assertTrue(np.isnan(equatic.parse('sin(x)/x', 0)))
+        self.assertTrue(np.isnan(equatic.parse('gamma(x)/gamma(x)', 0)))
+        self.assertEqual(equatic.parse('log10(x)', 100), 2.)
+        with self.assertRaises(ArithmeticError):
+            equatic.parse('sqrt(x)', -4)
+        with self.assertRaises(SystemExit):
+            equatic.parse('sin(x')
+
+    def test_parse_single_value_logging(self):
+        _logger.info("\nRunning Single Value Logging Level Test: 'cos(1)'")
+        eqtc_logger = logging.getLogger('equatic')
+        for level in ['DEBUG', 'ERROR', 'DEBUG', 'ERROR']:
+            equatic.parse('cos(1)', debug=level)
+            self.assertEqual(logging.getLevelName(eqtc_logger.level), level)
+
+    def test_compiled_dangerous_input(self):
+        _logger.info("\nRunning Compiled Dangerous Input Test")
+        with self.assertRaises(SystemExit):
+            equatic.compile_equation('__import__(os)')
+
+    def test_evaluate_chunks(self):
+        _logger.info("\nRunning Chunked Evaluation Test: 'sin(x)*x'")
+        test_array = np.linspace(-10, 10, 1001)
+        chunks = list(equatic.evaluate_chunks('sin(x)*x', [-10, 10, 1001], chunk_size=300))
+        self.assertEqual([len(x) for x, _ in chunks], [300, 300, 300, 101])
+        x = np.concatenate([x for x, _ in chunks])
+        y = np.concatenate([y for _, y in chunks])
+        self.assertListEqual(x.round(10).tolist(), test_array.round(10).tolist())
+        self.assertListEqual(y.round(4).tolist(), (np.sin(test_array)*test_array).round(4).tolist())
+
+    def test_evaluate_chunks_matches_parse(self):
+        _logger.info("\nRunning Chunked Evaluation Comparison Test: 'tanh(x)+atan(x)-atanh(x/3)'")
+        eqn_string = 'tanh(x)+atan(x)-atanh(x/3)'
+        chunks = list(equatic.evaluate_chunks(eqn_string, [-2, 2, 50], chunk_size=20))
+        y = np.concatenate([y for _, y in chunks])
+        test_y = equatic.parse(eqn_string, [-2, 2, 50])
+        self.assertListEqual(y.round(8).tolist(), test_y.round(8).tolist())
+
+    def test_evaluate_chunks_singularities(self):
+        _logger.info("\nRunning Chunked Evaluation Singularity Test: 'sin(x)/x'")
+        for eqn_string, func_range in [('sin(x)/x', [-1, 1, 3]),
+                                       ('(x**2-1)/(x-1)', [0, 2, 3]),
+                                       ('1/(x+1)', [-2, 0, 3])]:
+            _, y = next(equatic.evaluate_chunks(eqn_string, func_range))
+            test_y = equatic.parse(eqn_string, func_range)
+            self.assertListEqual(np.isnan(y).tolist(), np.isnan(test_y).tolist())
+            self.assertListEqual(y[~np.isnan(y)].round(8).tolist(),
+                                 test_y[~np.isnan(test_y)].round(8).tolist())
+        import matplotlib
+        matplotlib.use('Agg')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            npy_file = os.path.join(tmp_dir, 'sinc.npy')
+            equatic.plot('sin(x)/x', [-10, 10, 1001], show=False, export=npy_file)
+            npy_out = np.load(npy_file)
+        self.assertTrue(np.isnan(npy_out[500, 1]))
+        self.assertTrue(np.isfinite(np.delete(npy_out[:,1], 500)).all())
+
+    def test_plot_export_poles(self):
+        _logger.info("\nRunning Plot Export Pole Test: 'gamma(x)'")
+        import matplotlib
+        matplotlib.use('Agg')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            npy_file = os.path.join(tmp_dir, 'gamma.npy')
+            equatic.plot('gamma(x)', [-2, 2, 5], show=False, export=npy_file)
+            npy_out = np.load(npy_file)
+        self.assertListEqual(npy_out[:,1].tolist(), [np.inf, np.inf, np.inf, 1., 1.])
+        x, y = next(equatic.evaluate_chunks('cot(x)*x', [-1, 1, 3]))
+        self.assertTrue(np.isnan(y[1]))
+        self.assertListEqual(y[[0, 2]].round(8).tolist(), [0.64209262, 0.64209262])
+
+    def test_minmax_bins(self):
+        _logger.info("\nRunning Min/Max Binning Test")
+        x = np.arange(10.)
+        y = np.array([1., 5., -2., 0., np.inf, np.inf, 3., 7., -1., 2.])
+        x_out, y_out = equatic._minmax_bins(x, y, 4)
+        self.assertListEqual(x_out.tolist(), [1., 2., 6., 7., 8., 9.])
+        self.assertListEqual(y_out.tolist(), [5., -2., 3., 7., -1., 2.])
+        x_out, y_out = equatic._minmax_bins(x, y, 2)
+        self.assertTrue(np.isnan(y_out[4:6]).all())
+
+    def test_export(self):
+        _logger.info("\nRunning Streamed Export Test: 'tan(x)'")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            npy_file = os.path.join(tmp_dir, 'tan.npy')
+            csv_file = os.path.join(tmp_dir, 'tan.csv')
+            equatic.export('tan(x)', npy_file, [-1, 1, 2500], chunk_size=1000)
+            equatic.export('tan(x)', csv_file, [-1, 1, 2500], chunk_size=1000)
+            npy_out = np.load(npy_file)
+            csv_out = np.loadtxt(csv_file, delimiter=',')
+        self.assertEqual(npy_out.shape, (2500, 2))
+        self.assertListEqual(npy_out[:,1].round(4).tolist(), np.tan(npy_out[:,0]).round(4).tolist())
+        self.assertListEqual(npy_out.round(8).tolist(), csv_out.round(8).tolist())
+
+    def test_export_bad_args(self):
+        _logger.info("\nRunning Export Argument Check Test")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            txt_file = os.path.join(tmp_dir, 'out.txt')
+            with self.assertRaises(ValueError):
+                equatic.export('x', txt_file, [0, 1, 10])
+            with self.assertRaises(ValueError):
+                equatic.plot('x', [0, 1, 10], show=False, export=txt_file)
+            self.assertFalse(os.path.exists(txt_file))
+            with self.assertRaises(ValueError):
+                equatic.export('x', os.path.join(tmp_dir, 'out.npy'), [0, 1, 10], chunk_size=0)
+            with self.assertRaises(ValueError):
+                equatic.export('x', os.path.join(tmp_dir, 'out.npy'), [0, 1, 0])
+            with self.assertRaises(ValueError):
+                equatic.plot('x', [0, 1, 0], show=False)
+            self.assertListEqual(os.listdir(tmp_dir), [])
+
+    def test_export_failure_cleanup(self):
+        _logger.info("\nRunning Failed Export Cleanup Test: 'sqrt(x)'")
+        import matplotlib
+        matplotlib.use('Agg')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ['sqrt.npy', 'sqrt.csv']:
+                with self.assertRaises(ArithmeticError):
+                    equatic.export('sqrt(x)', os.path.join(tmp_dir, name),
+                                   [10, -1, 2000], chunk_size=100)
+            with self.assertRaises(ArithmeticError):
+                equatic.plot('sqrt(x)', [10, -1, 2000], show=False,
+                             export=os.path.join(tmp_dir, 'plot.npy'), chunk_size=100)
+            self.assertListEqual(os.listdir(tmp_dir), [])
+
+    def test_plot_export(self):
+        _logger.info("\nRunning Plot Export Test: '1/(x+1)'")
+        import matplotlib
+        matplotlib.use('Agg')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            npy_file = os.path.join(tmp_dir, 'plot.npy')
+            equatic.plot('1/(x+1)', [-2, 2, 4001], show=False, export=npy_file, resolution=100)
+            npy_out = np.load(npy_file)
+        self.assertEqual(npy_out.shape, (4001, 2))
+        self.assertEqual(npy_out[1000, 1], np.inf)
+
 
 if __name__ == '__main__':
     unittest.main()